@@ -0,0 +1,20 @@
+# azure_functions/HealthFunction/__init__.py
+import orjson
+import azure.functions as func
+
+from shared_code import reco_core
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Sonde de disponibilité (GET /api/health).
+    Ne charge pas les modèles et ne calcule aucune recommandation.
+    """
+    return func.HttpResponse(
+        orjson.dumps({
+            'status': 'ok',
+            'models_loaded': reco_core.get_loaded_models()
+        }),
+        status_code=200,
+        mimetype="application/json"
+    )
@@ -0,0 +1,93 @@
+# azure_functions/RecommendationBatchFunction/__init__.py
+import logging
+import orjson
+import azure.functions as func
+import time
+
+from shared_code import reco_core
+
+# Nombre maximal d'utilisateurs par requête batch
+MAX_BATCH_SIZE = 50
+
+
+def score_user(user: dict) -> dict:
+    """Calcule les recommandations d'un élément du batch (erreur isolée par utilisateur)."""
+    try:
+        user_id = int(user['user_id'])
+    except (KeyError, TypeError, ValueError):
+        return {'status': 'error', 'error': 'user_id required (integer)'}
+    
+    # Historique ou n_recommendations invalides : erreur pour cet élément seulement
+    try:
+        result = reco_core.score(
+            user_id,
+            user.get('history', []),
+            user.get('n_recommendations', 5)
+        )
+    except Exception as e:
+        logging.warning(f"Batch: erreur pour user {user_id}: {str(e)}")
+        return {'status': 'error', 'user_id': user_id, 'error': str(e)}
+    return {'status': 'success', 'user_id': user_id, **result}
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Recommandations pour plusieurs utilisateurs en un seul appel.
+    Corps attendu : {"users": [{"user_id", "history", "n_recommendations"}, ...]}
+    """
+    start_time = time.perf_counter_ns()
+    
+    try:
+        try:
+            body = req.get_json()
+        except ValueError:
+            body = None
+        users = body.get('users') if isinstance(body, dict) else None
+        
+        # Validation
+        if not isinstance(users, list) or not all(isinstance(u, dict) for u in users):
+            return func.HttpResponse(
+                orjson.dumps({'error': 'users must be a list of objects'}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        if len(users) > MAX_BATCH_SIZE:
+            return func.HttpResponse(
+                orjson.dumps({'error': f'at most {MAX_BATCH_SIZE} users per batch'}),
+                status_code=400,
+                mimetype="application/json"
+            )
+        
+        # Modèles chargés une seule fois pour tout le batch
+        if not reco_core.load_models_from_blob():
+            return func.HttpResponse(
+                orjson.dumps({'error': 'Failed to load models'}),
+                status_code=500,
+                mimetype="application/json"
+            )
+        
+        results = [score_user(user) for user in users]
+        
+        response = {
+            'status': 'success',
+            'n_users': len(results),
+            'results': results,
+            'inference_time_ms': (time.perf_counter_ns() - start_time) / 1e6
+        }
+        logging.info(f"✅ Batch de {len(results)} utilisateurs en {response['inference_time_ms']:.1f}ms")
+        
+        return func.HttpResponse(
+            orjson.dumps(response, option=reco_core.JSON_OPTIONS),
+            status_code=200,
+            mimetype="application/json"
+        )
+        
+    except Exception as e:
+        logging.error(f"❌ Erreur batch: {str(e)}")
+        return func.HttpResponse(
+            orjson.dumps({
+                'error': str(e),
+                'response_time_ms': (time.perf_counter_ns() - start_time) / 1e6
+            }),
+            status_code=500,
+            mimetype="application/json"
+        )
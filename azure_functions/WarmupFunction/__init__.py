@@ -0,0 +1,26 @@
+# azure_functions/WarmupFunction/__init__.py
+import logging
+import azure.functions as func
+import time
+
+from shared_code import reco_core
+
+
+def main(warmupContext: func.Context) -> None:
+    """
+    Déclencheur warmup de l'Azure Function (plans Premium/Dedicated).
+    Charge les modèles et exécute un premier calcul avant que l'instance
+    ne reçoive du trafic, pour sortir le démarrage à froid du chemin utilisateur.
+    """
+    start_time = time.perf_counter_ns()
+    
+    if not reco_core.load_models_from_blob():
+        logging.error("❌ Warmup: échec du chargement des modèles")
+        return
+    
+    # Premier passage sur les chemins CB, CF et fusion
+    cb_recs = reco_core.get_cb_recommendations([0], 5)
+    cf_recs = reco_core.get_cf_recommendations(0, 5)
+    reco_core.merge_recommendations(cb_recs, cf_recs, (0.5, 0.5), 5)
+    
+    logging.info(f"✅ Warmup terminé en {(time.perf_counter_ns() - start_time) / 1e6:.1f}ms")
@@ -0,0 +1,472 @@
+# azure_functions/shared_code/reco_core.py
+"""
+Cœur du système de recommandation hybride, partagé par les Azure Functions.
+Chargement des modèles depuis Blob Storage, scoring CB/CF et fusion.
+"""
+import logging
+import pickle
+import tempfile
+import numpy as np
+import orjson
+import os
+from azure.core.exceptions import ResourceNotFoundError
+from azure.storage.blob import BlobServiceClient
+from typing import Dict, List, Tuple
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# ===== IMPLEMENTATION CACHE LRU =====
+class LRUCache:
+    """Cache LRU (Least Recently Used) pour optimiser les performances."""
+    
+    def __init__(self, capacity: int = 100):
+        self.cache = OrderedDict()
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        """Récupère une valeur du cache et la marque comme récemment utilisée."""
+        if key not in self.cache:
+            self.misses += 1
+            return None
+        # Déplacer en fin (plus récemment utilisé)
+        self.cache.move_to_end(key)
+        self.hits += 1
+        return self.cache[key]
+    
+    def put(self, key, value):
+        """Ajoute ou met à jour une valeur dans le cache."""
+        if key in self.cache:
+            # Mettre à jour et déplacer en fin
+            self.cache.move_to_end(key)
+        self.cache[key] = value
+        # Si dépassement capacité, supprimer le plus ancien (LRU)
+        while len(self.cache) > self.capacity:
+            oldest, _ = self.cache.popitem(last=False)
+            logging.info(f"LRU: Éviction de l'entrée {oldest}")
+    
+    def clear(self):
+        """Vide complètement le cache."""
+        self.cache.clear()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_stats(self):
+        """Retourne les statistiques du cache."""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        return {
+            'size': len(self.cache),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': hit_rate
+        }
+
+# ===== CACHES GLOBAUX =====
+_models_cache = {}  # Cache des modèles (pas LRU car chargés une fois)
+_models_lock = threading.Lock()  # Protège le chargement initial des modèles
+_scratch = threading.local()  # Buffers de similarités réutilisés (un par thread)
+
+# Blobs à charger au démarrage (nom dans le cache -> chemin dans le container)
+MODEL_BLOBS = {
+    'cb': "models/cb_pca50.pkl",
+    'cf': "models/cf_svd.pkl",
+    'metadata': "config/metadata.pkl"
+}
+BLOB_MAX_CONCURRENCY = 4  # Connexions parallèles par blob
+
+# Embeddings CB normalisés au format .npy, mappés en mémoire depuis le disque local
+CB_EMBEDDINGS_BLOB = "models/cb_pca50_norm.npy"
+CB_EMBEDDINGS_PATH = os.path.join(tempfile.gettempdir(), "cb_pca50_norm.npy")
+# ETag du blob dont provient la copie locale (écrit après le renommage du .npy)
+CB_EMBEDDINGS_ETAG_PATH = CB_EMBEDDINGS_PATH + ".etag"
+
+# Poids en dessous duquel une source n'est pas calculée
+MIN_WEIGHT = 1e-6
+
+# Libellés des sources de recommandation (indexés par bits : 1 = CB, 2 = CF)
+SOURCE_LABELS = (None, 'content_based', 'collaborative', 'hybrid')
+
+# Sérialisation des réponses des Functions (orjson : encodeur C, accepte les scalaires NumPy)
+JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+
+# Connection string Azurite
+CONN_STR = os.environ.get('AZURE_STORAGE_CONNECTION_STRING', 
+                          "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1")
+
+
+def download_blob_bytes(container, blob_name: str) -> bytes:
+    """Télécharge un blob complet (blocs récupérés en parallèle)."""
+    blob = container.get_blob_client(blob_name)
+    return blob.download_blob(max_concurrency=BLOB_MAX_CONCURRENCY).readall()
+
+def prepare_cb_model(cb: Dict) -> Dict:
+    """Prépare un modèle CB picklé : embeddings float32 normalisés.
+    
+    Seule la matrice normalisée est conservée (les rangs CB n'utilisent
+    que des vecteurs unitaires), la copie brute est libérée.
+    """
+    # float32 C-contiguë : le produit matrice-vecteur passe par SGEMV (BLAS)
+    emb = np.ascontiguousarray(cb.pop('embeddings'), dtype=np.float32)
+    
+    # Normaliser une seule fois (similarité cosinus = produit scalaire) :
+    # normes carrées en une passe (einsum), puis mise à l'échelle en place
+    sq_norms = np.einsum('ij,ij->i', emb, emb)
+    sq_norms[sq_norms == 0] = 1
+    emb *= (1.0 / np.sqrt(sq_norms))[:, None]
+    cb['embeddings_norm'] = emb
+    return cb
+
+def read_local_etag() -> str:
+    """ETag du blob d'embeddings copié localement ('' si inconnu)."""
+    try:
+        with open(CB_EMBEDDINGS_ETAG_PATH) as f:
+            return f.read()
+    except OSError:
+        return ''
+
+def load_cb_model(container) -> Dict:
+    """Charge le modèle CB.
+    
+    Le format privilégié est un .npy d'embeddings déjà normalisés (float32),
+    écrit sur disque puis mappé en mémoire : pas de désérialisation pickle
+    ni de double copie, et le page cache est partagé entre invocations.
+    Le fichier est partagé par les workers de l'hôte : s'il est déjà
+    présent et provient de la version courante du blob (même ETag), il est
+    simplement re-mappé sans téléchargement.
+    Le pickle historique sert de repli si le .npy n'a pas été publié.
+    """
+    blob = container.get_blob_client(CB_EMBEDDINGS_BLOB)
+    try:
+        etag = blob.get_blob_properties().etag
+        if not (os.path.exists(CB_EMBEDDINGS_PATH) and read_local_etag() == etag):
+            # Écriture dans un fichier propre au processus puis renommage atomique :
+            # un autre worker qui mappe déjà l'ancien fichier n'est pas affecté
+            tmp_path = f"{CB_EMBEDDINGS_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                blob.download_blob(max_concurrency=BLOB_MAX_CONCURRENCY).readinto(f)
+            os.replace(tmp_path, CB_EMBEDDINGS_PATH)
+            # ETag publié après le .npy : un ETag à jour implique un fichier à jour
+            tmp_path = f"{CB_EMBEDDINGS_ETAG_PATH}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(etag)
+            os.replace(tmp_path, CB_EMBEDDINGS_ETAG_PATH)
+    except ResourceNotFoundError:
+        logging.info(f"{CB_EMBEDDINGS_BLOB} absent, repli sur {MODEL_BLOBS['cb']}")
+        return prepare_cb_model(pickle.loads(download_blob_bytes(container, MODEL_BLOBS['cb'])))
+    
+    return {'embeddings_norm': np.load(CB_EMBEDDINGS_PATH, mmap_mode='r')}
+
+def load_models_from_blob():
+    """Charge tous les modèles depuis Blob Storage."""
+    global _models_cache
+    
+    if _models_cache:
+        return True 
+    
+    # Un seul chargement même si plusieurs requêtes arrivent à froid en parallèle
+    with _models_lock:
+        if _models_cache:
+            return True
+        return _load_models_locked()
+
+def get_loaded_models() -> List[str]:
+    """Noms des modèles déjà chargés dans ce worker."""
+    return list(_models_cache.keys())
+
+def _load_models_locked():
+    """Télécharge et prépare les modèles (appelé sous _models_lock)."""
+    try:
+        blob_service = BlobServiceClient.from_connection_string(CONN_STR)
+        container = blob_service.get_container_client("recommendation-models")
+        
+        # Télécharger les blobs en parallèle : latence ~ max(t_i) au lieu de sum(t_i)
+        logging.info("Téléchargement des modèles...")
+        with ThreadPoolExecutor(max_workers=len(MODEL_BLOBS)) as executor:
+            cb_future = executor.submit(load_cb_model, container)
+            futures = {
+                name: executor.submit(download_blob_bytes, container, blob_name)
+                for name, blob_name in MODEL_BLOBS.items() if name != 'cb'
+            }
+            blobs = {name: future.result() for name, future in futures.items()}
+            cb = cb_future.result()
+        
+        # Appel à blanc : initialise BLAS avant la première vraie requête
+        first = np.zeros(1, dtype=np.int64)
+        n_articles = len(cb['embeddings_norm'])
+        cb_score(cb['embeddings_norm'], first, first, 1, out=get_scratch_buffer(n_articles))
+        logging.info(f"✅ CB chargé: {cb['embeddings_norm'].nbytes/1024**2:.1f} MB")
+        
+        # Charger CF model
+        cf = pickle.loads(blobs['cf'])
+        logging.info(f"✅ CF chargé: {len(blobs['cf'])/1024**2:.1f} MB")
+        
+        # Charger metadata
+        metadata = pickle.loads(blobs['metadata'])
+        if 'fallback_articles' not in metadata:
+            logging.warning("⚠️ metadata sans 'fallback_articles' : repli articles populaires désactivé")
+        # Articles populaires triés une fois (repli sans tri par requête)
+        metadata['popular_sorted'] = sorted(
+            metadata.get('fallback_articles', {}).items(),
+            key=lambda x: x[1],
+            reverse=True
+        )
+        logging.info("✅ Metadata chargé")
+        
+        # Publier le cache seulement quand tout est chargé
+        _models_cache.update(cb=cb, cf=cf, metadata=metadata)
+        return True
+        
+    except Exception as e:
+        logging.error(f"❌ Erreur chargement modèles: {str(e)}")
+        return False
+
+def get_scratch_buffer(size: int) -> np.ndarray:
+    """Retourne le buffer de similarités du thread courant (alloué une fois)."""
+    buffer = getattr(_scratch, 'similarities', None)
+    if buffer is None or buffer.shape[0] != size:
+        buffer = np.empty(size, dtype=np.float32)
+        _scratch.similarities = buffer
+    return buffer
+
+def cb_score(
+    embeddings_norm: np.ndarray,
+    recent: np.ndarray,
+    seen: np.ndarray,
+    k: int,
+    out: np.ndarray = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Noyau CB : profil, similarités, exclusion et top-k en une passe.
+    
+    Args:
+        embeddings_norm: Embeddings normalisés (float32, C-contigus)
+        recent: Indices valides des articles récents (profil utilisateur)
+        seen: Indices valides des articles déjà vus (exclus)
+        k: Nombre de candidats à retourner
+        out: Buffer float32 de taille N réutilisé pour les similarités (optionnel)
+    
+    Returns:
+        Indices et scores des k meilleurs articles, triés par score décroissant
+    """
+    empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    if recent.size == 0:
+        return empty
+    
+    # Profil non normalisé : la norme ne fait que changer l'échelle des
+    # similarités (ordre, signe et fusion min-max inchangés)
+    # Rester en float32 : un vecteur float64 forcerait une copie float64 de la matrice
+    user_profile = embeddings_norm[recent].sum(axis=0, dtype=np.float32)
+    if not user_profile.any():
+        return empty
+    
+    # Calculer similarités (embeddings déjà normalisés au chargement)
+    similarities = np.dot(embeddings_norm, user_profile, out=out)
+    
+    # Exclure articles déjà vus (les similarités ne sont plus bornées par 1)
+    similarities[seen] = -np.inf
+    
+    # Top N : sélection partielle O(N), puis tri des k candidats seulement
+    k = min(k, len(similarities))
+    if k <= 0:
+        return empty
+    candidates = np.argpartition(similarities, -k)[-k:]
+    top_indices = candidates[np.argsort(similarities[candidates])[::-1]]
+    return top_indices, similarities[top_indices]
+
+def get_cb_recommendations(user_history: List[int], n_recs: int = 10) -> List[Tuple[int, float]]:
+    """Calcule les recommandations Content-Based."""
+    if 'cb' not in _models_cache:
+        return []
+    
+    embeddings_norm = _models_cache['cb']['embeddings_norm']
+    n_articles = len(embeddings_norm)
+    
+    # Un seul masque de validité (un id négatif indexerait depuis la fin)
+    history = np.asarray(user_history, dtype=np.int64)
+    valid = (history >= 0) & (history < n_articles)
+    
+    # Profil sur les 20 derniers articles, exclusion sur tout l'historique
+    recent = history[-20:][valid[-20:]]
+    seen = history[valid]
+    top_indices, top_scores = cb_score(
+        embeddings_norm, recent, seen, n_recs,
+        out=get_scratch_buffer(n_articles)
+    )
+    
+    return [(int(idx), float(score)) 
+            for idx, score in zip(top_indices, top_scores) if score > 0]
+
+def get_cf_recommendations(user_id: int, n_recs: int = 10) -> List[Tuple[int, float]]:
+    """Calcule les recommandations Collaborative Filtering."""
+    if 'cf' not in _models_cache:
+        return []
+    
+    try:
+        # Pour le POC: Simuler avec des scores basés sur user_id
+        # TODO: Implémenter avec vrai modèle SVD en production
+        # Générateur local (PCG64) : pas d'état global partagé entre requêtes
+        rng = np.random.default_rng(user_id)
+        articles = rng.choice(1000, n_recs, replace=False)
+        scores = rng.uniform(0.3, 0.9, n_recs)
+        
+        return [(int(article), float(score)) 
+                for article, score in zip(articles, scores)]
+    except Exception as e:
+        logging.error(f"Erreur CF: {str(e)}")
+        return []
+
+def normalize_scores(scores: np.ndarray) -> np.ndarray:
+    """Normalise des scores entre 0 et 1 (min-max)."""
+    if scores.size == 0:
+        return scores
+    min_score = scores.min()
+    max_score = scores.max()
+    if max_score == min_score:
+        return np.ones_like(scores)
+    return (scores - min_score) / (max_score - min_score)
+
+def merge_recommendations(
+    cb_recs: List[Tuple[int, float]], 
+    cf_recs: List[Tuple[int, float]], 
+    weights: Tuple[float, float],
+    n_final: int = 5
+) -> List[Dict]:
+    """Fusionne les recommandations CB et CF avec normalisation."""
+    cb_weight, cf_weight = weights
+    
+    # Représentation en tableaux (ids, scores) plutôt qu'en dictionnaires
+    cb = np.asarray(cb_recs, dtype=np.float64).reshape(-1, 2)
+    cf = np.asarray(cf_recs, dtype=np.float64).reshape(-1, 2)
+    
+    # Une seule source (cold start, poids nul) : pas de fusion à faire
+    if len(cb) == 0 or len(cf) == 0:
+        recs, weight, source = (cb, cb_weight, 'content_based') if len(cb) else (cf, cf_weight, 'collaborative')
+        single_scores = normalize_scores(recs[:, 1]) * weight
+        order = np.argsort(-single_scores, kind='stable')[:n_final]
+        return [
+            {
+                'article_id': int(recs[i, 0]),
+                'score': float(single_scores[i]),
+                'source': source,
+                'rank': rank + 1
+            }
+            for rank, i in enumerate(order)
+        ]
+    
+    # Normaliser avant pondération
+    ids = np.concatenate([cb[:, 0], cf[:, 0]]).astype(np.int64)
+    scores = np.concatenate([
+        normalize_scores(cb[:, 1]) * cb_weight,
+        normalize_scores(cf[:, 1]) * cf_weight
+    ])
+    # Source en bits : 1 = CB, 2 = CF, 3 = les deux (hybride)
+    flags = np.concatenate([
+        np.full(len(cb), 1, dtype=np.int8),
+        np.full(len(cf), 2, dtype=np.int8)
+    ])
+    
+    # Dédoublonner : somme des scores et union des sources par article
+    unique_ids, first_pos, inverse = np.unique(ids, return_index=True, return_inverse=True)
+    merged_scores = np.zeros(unique_ids.size)
+    np.add.at(merged_scores, inverse, scores)
+    sources = np.zeros(unique_ids.size, dtype=np.int8)
+    np.bitwise_or.at(sources, inverse, flags)
+    
+    # Trier par score décroissant (à égalité, ordre d'apparition : CB puis CF)
+    order = np.lexsort((first_pos, -merged_scores))[:n_final]
+    
+    return [
+        {
+            'article_id': int(unique_ids[i]),
+            'score': float(merged_scores[i]),
+            'source': SOURCE_LABELS[sources[i]],
+            'rank': rank + 1
+        }
+        for rank, i in enumerate(order)
+    ]
+
+def get_popular_recommendations(user_history: List[int], n_recs: int = 5) -> List[Dict]:
+    """Recommande les articles les plus populaires non encore vus (repli)."""
+    if 'metadata' not in _models_cache:
+        return []
+    
+    popular_sorted = _models_cache['metadata']['popular_sorted']
+    if not popular_sorted:
+        return []
+    
+    seen = set(user_history)
+    max_count = popular_sorted[0][1]
+    recommendations = []
+    for article_id, count in popular_sorted:
+        if article_id in seen:
+            continue
+        recommendations.append({
+            'article_id': int(article_id),
+            'score': float(count / max_count),
+            'source': 'popular',
+            'rank': len(recommendations) + 1
+        })
+        if len(recommendations) == n_recs:
+            break
+    return recommendations
+
+def get_user_profile(history_length: int) -> str:
+    """Détermine le profil utilisateur basé sur l'historique."""
+    if history_length <= 5:
+        return "cold_start"
+    elif history_length <= 15:
+        return "moderate"
+    else:
+        return "active"
+
+def get_strategy_weights(profile: str) -> Tuple[float, float]:
+    """Retourne les poids CB/CF selon le profil."""
+    strategies = {
+        'cold_start': (1.0, 0.0),
+        'moderate': (0.7, 0.3),
+        'active': (0.3, 0.7)
+    }
+    return strategies.get(profile, (0.5, 0.5))
+
+def score(user_id: int, user_history: List[int], n_recommendations: int = 5) -> Dict:
+    """Calcule les recommandations hybrides d'un utilisateur.
+    
+    Les modèles doivent avoir été chargés via load_models_from_blob().
+    
+    Returns:
+        Dictionnaire avec stratégie, poids, nombre d'interactions,
+        recommandations fusionnées et modèles chargés
+    """
+    # Déterminer le profil et la stratégie
+    n_interactions = len(user_history)
+    profile = get_user_profile(n_interactions)
+    weights = get_strategy_weights(profile)
+    cb_weight, cf_weight = weights
+    
+    strategy = f"{profile} (CB:{cb_weight:.0%}, CF:{cf_weight:.0%})"
+    
+    logging.info(f"User {user_id}: {n_interactions} interactions, stratégie: {strategy}")
+    
+    # Obtenir recommandations
+    cb_recs = get_cb_recommendations(user_history, n_recommendations * 2) if cb_weight > MIN_WEIGHT else []
+    cf_recs = get_cf_recommendations(user_id, n_recommendations * 2) if cf_weight > MIN_WEIGHT else []
+    
+    # Fusionner
+    final_recommendations = merge_recommendations(
+        cb_recs, cf_recs, weights, n_recommendations
+    )
+    
+    # Aucun signal exploitable (historique vide ou inconnu) : articles populaires
+    if not final_recommendations:
+        final_recommendations = get_popular_recommendations(user_history, n_recommendations)
+    
+    return {
+        'strategy': strategy,
+        'weights': {'cb': weights[0], 'cf': weights[1]},
+        'n_interactions': n_interactions,
+        'recommendations': final_recommendations,
+        'models_loaded': get_loaded_models()
+    }
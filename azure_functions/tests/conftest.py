@@ -0,0 +1,25 @@
+# azure_functions/tests/conftest.py
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Racine du Function App : mêmes imports que l'hôte (shared_code, <Function>)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared_code import reco_core
+
+
+@pytest.fixture
+def models():
+    """Modèles minimaux publiés dans le cache de reco_core (sans Blob Storage)."""
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((100, 8)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1)[:, None]
+    metadata = {'popular_sorted': [(7, 100), (3, 75), (9, 50), (1, 25)]}
+    reco_core._models_cache.update(
+        cb={'embeddings_norm': embeddings}, cf={}, metadata=metadata
+    )
+    yield reco_core._models_cache
+    reco_core._models_cache.clear()
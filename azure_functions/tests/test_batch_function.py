@@ -0,0 +1,42 @@
+# azure_functions/tests/test_batch_function.py
+import orjson
+import azure.functions as func
+
+import RecommendationBatchFunction
+
+
+def post_batch(users) -> func.HttpResponse:
+    req = func.HttpRequest(
+        method='POST',
+        url='/api/recommend_batch',
+        body=orjson.dumps({'users': users})
+    )
+    return RecommendationBatchFunction.main(req)
+
+
+def test_bad_entry_does_not_fail_batch(models):
+    response = post_batch([
+        {'user_id': 1, 'history': [10, 20, 30], 'n_recommendations': 3},
+        {'user_id': 2, 'history': 'abc', 'n_recommendations': 3},
+        {'user_id': 3, 'history': [10, 20], 'n_recommendations': 'x'},
+    ])
+
+    assert response.status_code == 200
+    body = orjson.loads(response.get_body())
+    assert body['n_users'] == 3
+    good, bad_history, bad_n = body['results']
+    assert good['status'] == 'success'
+    assert len(good['recommendations']) == 3
+    assert bad_history['status'] == 'error'
+    assert bad_history['user_id'] == 2
+    assert bad_n['status'] == 'error'
+    assert bad_n['user_id'] == 3
+
+
+def test_missing_user_id_is_an_error_item(models):
+    response = post_batch([{'history': [1]}, {'user_id': 4, 'history': [10]}])
+
+    assert response.status_code == 200
+    results = orjson.loads(response.get_body())['results']
+    assert results[0]['status'] == 'error'
+    assert results[1]['status'] == 'success'
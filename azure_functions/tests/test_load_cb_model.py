@@ -0,0 +1,61 @@
+# azure_functions/tests/test_load_cb_model.py
+import io
+import types
+
+import numpy as np
+import pytest
+
+from shared_code import reco_core
+
+
+class FakeBlob:
+    """Blob .npy minimal : propriétés (ETag) et téléchargement."""
+
+    def __init__(self, array: np.ndarray, etag: str):
+        self.etag = etag
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        self.data = buffer.getvalue()
+        self.downloads = 0
+
+    def get_blob_properties(self):
+        return types.SimpleNamespace(etag=self.etag, size=len(self.data))
+
+    def download_blob(self, **kwargs):
+        self.downloads += 1
+        return types.SimpleNamespace(readinto=lambda f: f.write(self.data))
+
+
+class FakeContainer:
+    def __init__(self, blob: FakeBlob):
+        self.blob = blob
+
+    def get_blob_client(self, name):
+        return self.blob
+
+
+@pytest.fixture
+def local_paths(tmp_path, monkeypatch):
+    path = str(tmp_path / "cb_pca50_norm.npy")
+    monkeypatch.setattr(reco_core, 'CB_EMBEDDINGS_PATH', path)
+    monkeypatch.setattr(reco_core, 'CB_EMBEDDINGS_ETAG_PATH', path + ".etag")
+
+
+def test_same_etag_reuses_local_copy(local_paths):
+    blob = FakeBlob(np.ones((4, 3), dtype=np.float32), etag='"v1"')
+    reco_core.load_cb_model(FakeContainer(blob))
+    reco_core.load_cb_model(FakeContainer(blob))
+
+    assert blob.downloads == 1
+
+
+def test_new_etag_with_same_size_is_downloaded(local_paths):
+    old = FakeBlob(np.ones((4, 3), dtype=np.float32), etag='"v1"')
+    reco_core.load_cb_model(FakeContainer(old))
+
+    new = FakeBlob(np.full((4, 3), 2, dtype=np.float32), etag='"v2"')
+    assert len(new.data) == len(old.data)
+    cb = reco_core.load_cb_model(FakeContainer(new))
+
+    assert new.downloads == 1
+    assert np.all(cb['embeddings_norm'] == 2)
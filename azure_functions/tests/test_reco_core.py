@@ -0,0 +1,111 @@
+# azure_functions/tests/test_reco_core.py
+import numpy as np
+
+from shared_code import reco_core
+
+
+def test_empty_history_gets_popular_articles(models):
+    result = reco_core.score(1, [], 3)
+
+    assert result['strategy'].startswith('cold_start')
+    assert [rec['article_id'] for rec in result['recommendations']] == [7, 3, 9]
+    assert [rec['rank'] for rec in result['recommendations']] == [1, 2, 3]
+    assert all(rec['source'] == 'popular' for rec in result['recommendations'])
+    # Score relatif à l'article le plus cliqué
+    assert result['recommendations'][0]['score'] == 1.0
+    assert result['recommendations'][1]['score'] == 0.75
+
+
+def test_popular_fallback_skips_seen_articles(models):
+    # Identifiants hors du modèle CB : aucun signal, seul le repli s'applique
+    models['metadata']['popular_sorted'] = [(500, 100), (501, 80), (502, 60)]
+
+    result = reco_core.score(1, [500], 2)
+
+    assert [rec['article_id'] for rec in result['recommendations']] == [501, 502]
+
+
+def test_history_with_signal_does_not_use_popular(models):
+    result = reco_core.score(1, [10, 20, 30], 3)
+
+    assert len(result['recommendations']) == 3
+    assert all(rec['source'] != 'popular' for rec in result['recommendations'])
+
+
+def plane_embeddings() -> np.ndarray:
+    """Embeddings 2D normalisés : similarités avec l'article 0 connues à l'avance."""
+    return np.array([
+        [1.0, 0.0],    # 0
+        [0.8, 0.6],    # 1 : 0.8
+        [0.6, 0.8],    # 2 : 0.6
+        [0.0, 1.0],    # 3 : 0.0
+        [-0.6, -0.8],  # 4 : -0.6
+        [-1.0, 0.0],   # 5 : -1.0
+    ], dtype=np.float32)
+
+
+def test_cb_score_excludes_seen_and_sorts_by_score():
+    indices, scores = reco_core.cb_score(
+        plane_embeddings(), np.array([0]), np.array([0, 1]), k=3
+    )
+
+    assert indices.tolist() == [2, 3, 4]
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_cb_score_without_recent_articles_is_empty():
+    empty = np.array([], dtype=np.int64)
+    indices, scores = reco_core.cb_score(plane_embeddings(), empty, empty, k=3)
+
+    assert indices.size == 0
+    assert scores.size == 0
+
+
+def test_cb_recommendations_ignore_out_of_range_ids(models):
+    # -1 indexerait le dernier article, 1000 dépasse la matrice (100 articles)
+    recs = reco_core.get_cb_recommendations([-1, 5, 1000], 10)
+
+    assert recs == reco_core.get_cb_recommendations([5], 10)
+    assert 5 not in [article_id for article_id, _ in recs]
+
+
+def test_cb_recommendations_exclude_whole_history(models):
+    # Profil sur les 20 derniers articles, exclusion sur tout l'historique
+    history = list(range(30))
+    recs = reco_core.get_cb_recommendations(history, 50)
+
+    assert recs
+    assert not set(article_id for article_id, _ in recs) & set(history)
+
+
+def test_cb_recommendations_keep_positive_scores_only(models):
+    models['cb']['embeddings_norm'] = plane_embeddings()
+
+    recs = reco_core.get_cb_recommendations([0], 5)
+
+    # Similarité nulle (article 3) et négatives exclues
+    assert [article_id for article_id, _ in recs] == [1, 2]
+
+
+def test_merge_sums_scores_and_orders_ties_cb_first():
+    cb_recs = [(1, 0.9), (2, 0.5), (3, 0.1)]
+    cf_recs = [(2, 0.8), (4, 0.6), (5, 0.4)]
+
+    merged = reco_core.merge_recommendations(cb_recs, cf_recs, (0.5, 0.5), n_final=5)
+
+    # 2 : 0.25 (CB) + 0.5 (CF) ; 3 et 5 à égalité (0), CB d'abord
+    assert [rec['article_id'] for rec in merged] == [2, 1, 4, 3, 5]
+    assert [rec['rank'] for rec in merged] == [1, 2, 3, 4, 5]
+    assert merged[0]['source'] == 'hybrid'
+    assert merged[0]['score'] == 0.75
+    assert merged[1]['source'] == 'content_based'
+    assert merged[2]['source'] == 'collaborative'
+
+
+def test_merge_single_source_truncates_to_n_final():
+    cb_recs = [(4, 0.2), (8, 0.9), (6, 0.5)]
+
+    merged = reco_core.merge_recommendations(cb_recs, [], (1.0, 0.0), n_final=2)
+
+    assert [rec['article_id'] for rec in merged] == [8, 6]
+    assert all(rec['source'] == 'content_based' for rec in merged)
@@ -0,0 +1,21 @@
+# azure_functions/tests/test_recommendation_function.py
+import numpy as np
+import orjson
+import pytest
+
+from RecommendationFunction import extend_json
+from shared_code import reco_core
+
+
+def test_extend_json_merges_fields():
+    body = orjson.dumps({'status': 'success', 'score': np.float32(0.5)}, option=reco_core.JSON_OPTIONS)
+
+    merged = orjson.loads(extend_json(body, {'from_cache': True}))
+
+    assert merged == {'status': 'success', 'score': 0.5, 'from_cache': True}
+
+
+def test_extend_json_rejects_unexpected_layout():
+    # Sérialisation compacte : pas de "\n}" final, le raccord serait invalide
+    with pytest.raises(AssertionError):
+        extend_json(orjson.dumps({'status': 'success'}), {'from_cache': True})
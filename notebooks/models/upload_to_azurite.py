@@ -1,6 +1,9 @@
 
 from azure.storage.blob import BlobServiceClient
+import io
+import numpy as np
 import os
+import pickle
 
 conn_str = "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1"
 
@@ -25,9 +28,29 @@ files = [
 for local_file, blob_name in files:
     if os.path.exists(local_file):
         blob_client = container.get_blob_client(blob_name)
-        with open(local_file, "rb") as data:
-            blob_client.upload_blob(data, overwrite=True)
-        size_mb = os.path.getsize(local_file) / (1024**2)
+        with open(local_file, "rb") as f:
+            data = f.read()
+        if blob_name == "models/cb_pca50.pkl":
+            # Embeddings en float32 : blob deux fois plus léger
+            cb = pickle.loads(data)
+            cb['embeddings'] = np.asarray(cb['embeddings'], dtype=np.float32)
+            data = pickle.dumps(cb, protocol=pickle.HIGHEST_PROTOCOL)
+        blob_client.upload_blob(data, overwrite=True)
+        size_mb = len(data) / (1024**2)
         print(f"✅ {blob_name} uploadé ({size_mb:.1f} MB)")
 
+# Embeddings CB normalisés en .npy (mappés en mémoire par l'Azure Function)
+if os.path.exists("blob_cb_pca50.pkl"):
+    with open("blob_cb_pca50.pkl", "rb") as f:
+        emb = np.ascontiguousarray(pickle.load(f)['embeddings'], dtype=np.float32)
+    sq_norms = np.einsum('ij,ij->i', emb, emb)
+    sq_norms[sq_norms == 0] = 1
+    emb *= (1.0 / np.sqrt(sq_norms))[:, None]
+    buffer = io.BytesIO()
+    np.save(buffer, emb)
+    blob_client = container.get_blob_client("models/cb_pca50_norm.npy")
+    blob_client.upload_blob(buffer.getvalue(), overwrite=True)
+    size_mb = buffer.tell() / (1024**2)
+    print(f"✅ models/cb_pca50_norm.npy uploadé ({size_mb:.1f} MB)")
+
 print("\n✅ Modèles prêts dans Azurite!")
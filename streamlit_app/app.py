@@ -5,11 +5,16 @@ Application de démonstration du système de recommandation hybride
 
 import streamlit as st
 import pandas as pd
+import numpy as np
+import pyarrow.parquet as pq
 import requests
-import json
-from pathlib import Path
+import orjson
 import time
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Mapping, Optional, Tuple
+from types import MappingProxyType
 import random
 
 # Configuration de la page
@@ -20,147 +25,247 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Configuration des chemins
-DATA_DIR = Path(__file__).parent / "data"
-SAMPLE_FILE = DATA_DIR / "clicks_sample.csv"
-FULL_FILE = DATA_DIR / "clicks.parquet"
+from common import (
+    ACTIVE_THRESHOLD, API_BASE_URL, COLD_START_THRESHOLD, DATA_DIR,
+    PROFILES, Histories, UserStats, call_recommendation_api,
+    count_articles, get_article_labels, get_article_popularity,
+    get_client_cache_key, get_http_session,
+    get_local_popular_recommendations, get_popular_counts,
+    is_artifact_fresh, load_click_data, post_json, remember_recommendation,
+    start_api_check, start_api_prewarm, update_api_status,
+)
 
-# URL de l'API Azure Functions
-import os
-API_URL = os.getenv('AZURE_FUNCTION_URL', 'http://localhost:7071') + "/api/recommend"
+# Historiques pré-calculés (streamlit_app/build_histories.py)
+HISTORIES_FILE = DATA_DIR / "user_histories.parquet"
 
-# Seuils pour les profils utilisateurs
-COLD_START_THRESHOLD = 5
-ACTIVE_THRESHOLD = 15
+# Endpoint batch de l'API Azure Functions
+BATCH_API_URL = API_BASE_URL + "/api/recommend_batch"
 
-# --- Fonctions de chargement des données ---
+# Premiers utilisateurs du menu déroulant dont les recommandations sont préchargées
+PREFETCH_USERS = 3
+# Attente maximale d'une réponse préchargée (timeout du POST + marge)
+RESULT_TIMEOUT = 15
 
-@st.cache_data
-def load_click_data(use_sample: bool = True) -> Tuple[pd.DataFrame, str]:
-    """Charge les données de clics."""
-    if use_sample:
-        if SAMPLE_FILE.exists():
-            df = pd.read_csv(SAMPLE_FILE)
-            return df, "sample"
-        else:
-            st.error(f"❌ Fichier non trouvé : {SAMPLE_FILE}")
-            return pd.DataFrame(), "error"
-    else:
-        if FULL_FILE.exists():
-            with st.spinner("Chargement du dataset complet (52 MB)..."):
-                df = pd.read_parquet(FULL_FILE)
-            return df, "full"
-        else:
-            st.error(f"❌ Fichier non trouvé : {FULL_FILE}")
-            return pd.DataFrame(), "error"
+# Stratégies par tranche d'activité (mêmes indices que PROFILES)
+STRATEGIES = (
+    {
+        "strategy": "cold_start",
+        "weights": {"cb": 1.0, "cf": 0.0},
+        "description": "100% Content-Based (utilisateur nouveau)",
+        "method": "Similarité cosinus sur embeddings PCA-50"
+    },
+    {
+        "strategy": "moderate",
+        "weights": {"cb": 0.7, "cf": 0.3},
+        "description": "70% Content-Based + 30% Collaborative",
+        "method": "Hybride pondéré (CB dominant)"
+    },
+    {
+        "strategy": "active",
+        "weights": {"cb": 0.3, "cf": 0.7},
+        "description": "30% Content-Based + 70% Collaborative",
+        "method": "Hybride pondéré (CF dominant avec SVD)"
+    },
+)
+
+# Libellés des profils pour le tirage aléatoire (clés des buckets)
+RANDOM_ALL_LABEL = "Aléatoire total"
+PROFILE_LABELS = ["Cold Start (≤5)", "Moderate (6-15)", "Active (>15)"]
+
+
+# --- Fonctions de chargement des données ---
 
-@st.cache_data
-def create_user_histories(df: pd.DataFrame) -> Tuple[Dict, Dict]:
+@st.cache_resource(hash_funcs={pd.DataFrame: id})
+def create_user_histories(df: pd.DataFrame) -> Tuple[Mapping, Mapping, Dict[str, np.ndarray]]:
     """Crée les dictionnaires d'historiques et statistiques utilisateurs."""
-    histories = {}
-    user_stats = {}
-    
-    grouped = df.groupby('user_id')
-    for user_id, group in grouped:
-        articles = group['click_article_id'].tolist()
-        histories[str(user_id)] = articles
-        user_stats[str(user_id)] = {
-            'n_clicks': len(articles),
-            'n_unique': len(set(articles))
-        }
-    
-    return histories, user_stats
-
-@st.cache_data
-def get_article_popularity(df: pd.DataFrame, top_n: int = 100) -> List[int]:
-    """Récupère les articles les plus populaires."""
-    article_counts = df['click_article_id'].value_counts()
-    return article_counts.head(top_n).index.tolist()
+    if df.empty:
+        return MappingProxyType({}), MappingProxyType({}), {}
+    
+    # Tri stable par utilisateur : l'ordre des clics est conservé dans chaque historique
+    user_ids = df['user_id'].to_numpy()
+    order = np.argsort(user_ids, kind='stable')
+    user_ids = user_ids[order]
+    articles = df['click_article_id'].to_numpy()[order]
+    
+    # Bornes de chaque utilisateur dans les tableaux triés (NumPy, sans groupby)
+    keys, starts, counts = np.unique(user_ids, return_index=True, return_counts=True)
+    
+    # Articles distincts : tri par (utilisateur, article) puis comptage des changements
+    pair_order = np.lexsort((articles, user_ids))
+    sorted_articles = articles[pair_order]
+    is_new = np.ones(len(sorted_articles), dtype=np.int64)
+    is_new[1:] = sorted_articles[1:] != sorted_articles[:-1]
+    is_new[starts] = 1
+    n_unique = np.add.reduceat(is_new, starts)
+    
+    buckets = build_profile_buckets(keys, counts)
+    offsets = np.append(starts, len(articles))
+    histories = Histories(keys, offsets, articles)
+    keys = keys.tolist()
+    user_stats = {
+        user_id: UserStats(n_clicks, n_uniq)
+        for user_id, n_clicks, n_uniq in zip(keys, counts.tolist(), n_unique.tolist())
+    }
+    
+    # Tables partagées entre sessions (cache_resource) : exposées en lecture seule
+    return histories, MappingProxyType(user_stats), buckets
+
+@st.cache_resource
+def load_prebuilt_histories() -> Tuple[Mapping, Mapping, Dict[str, np.ndarray]]:
+    """Charge les historiques pré-calculés du dataset complet (sans agrégation)."""
+    table = pq.read_table(HISTORIES_FILE, columns=['user_id', 'articles', 'n_clicks', 'n_unique'])
+    buckets = build_profile_buckets(
+        table['user_id'].to_numpy(), table['n_clicks'].to_numpy()
+    )
+    # Liste Arrow -> CSR sans copie : offsets et valeurs aplaties
+    articles = table['articles'].combine_chunks()
+    offsets = articles.offsets.to_numpy()
+    histories = Histories(
+        table['user_id'].to_numpy(), offsets - offsets[0], articles.flatten().to_numpy()
+    )
+    keys = table['user_id'].to_pylist()
+    user_stats = {
+        user_id: UserStats(n_clicks, n_uniq)
+        for user_id, n_clicks, n_uniq in zip(
+            keys, table['n_clicks'].to_pylist(), table['n_unique'].to_pylist()
+        )
+    }
+    return histories, MappingProxyType(user_stats), buckets
+
+def build_profile_buckets(user_ids: np.ndarray, n_clicks: np.ndarray) -> Dict[str, np.ndarray]:
+    """Répartit les utilisateurs par profil une fois pour toutes (tirage en O(1))."""
+    user_ids = np.asarray(user_ids, dtype=np.int32)
+    n_clicks = np.asarray(n_clicks)
+    cold = n_clicks <= COLD_START_THRESHOLD
+    active = n_clicks > ACTIVE_THRESHOLD
+    return dict(zip(
+        [RANDOM_ALL_LABEL] + PROFILE_LABELS,
+        [user_ids, user_ids[cold], user_ids[~cold & ~active], user_ids[active]]
+    ))
+
 
 # --- Fonctions utilitaires ---
 
+def get_profile_index(n_articles: int) -> int:
+    """Tranche d'activité : 0 = cold start, 1 = moderate, 2 = active."""
+    return (n_articles > COLD_START_THRESHOLD) + (n_articles > ACTIVE_THRESHOLD)
+
 def get_user_profile(n_articles: int) -> Tuple[str, str]:
     """Détermine le profil utilisateur basé sur le nombre d'articles."""
-    if n_articles <= COLD_START_THRESHOLD:
-        return "Cold Start", "🆕"
-    elif n_articles <= ACTIVE_THRESHOLD:
-        return "Moderate", "📊"
-    else:
-        return "Active", "🔥"
+    return PROFILES[get_profile_index(n_articles)]
 
 def get_strategy_info(n_articles: int) -> Dict:
-    """Retourne les informations de stratégie selon le profil."""
-    if n_articles <= COLD_START_THRESHOLD:
-        return {
-            "strategy": "cold_start",
-            "weights": {"cb": 1.0, "cf": 0.0},
-            "description": "100% Content-Based (utilisateur nouveau)",
-            "method": "Similarité cosinus sur embeddings PCA-50"
-        }
-    elif n_articles <= ACTIVE_THRESHOLD:
-        return {
-            "strategy": "moderate",
-            "weights": {"cb": 0.7, "cf": 0.3},
-            "description": "70% Content-Based + 30% Collaborative",
-            "method": "Hybride pondéré (CB dominant)"
-        }
-    else:
-        return {
-            "strategy": "active",
-            "weights": {"cb": 0.3, "cf": 0.7},
-            "description": "30% Content-Based + 70% Collaborative",
-            "method": "Hybride pondéré (CF dominant avec SVD)"
-        }
-
-def check_api_connection() -> bool:
-    """Vérifie la connexion à l'API."""
+    """Retourne les informations de stratégie selon le profil (lecture seule)."""
+    return STRATEGIES[get_profile_index(n_articles)]
+
+
+@st.cache_resource
+def get_api_executor() -> ThreadPoolExecutor:
+    """Pool dédié aux appels de recommandation en parallèle (préchargement, repli batch).
+    
+    Séparé de get_background_executor : ces appels ne retardent ni le
+    préchauffage ni la sonde de l'API.
+    """
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def submit_recommendation(user_id: int, history: List[int], n_recommendations: int) -> Future:
+    """Lance un appel de recommandation en arrière-plan (pool get_api_executor)."""
+    return get_api_executor().submit(
+        call_recommendation_api, user_id, history, n_recommendations, get_http_session()
+    )
+
+def wait_for_recommendation(future: Future) -> Dict:
+    """Attend la réponse d'un appel mis en file, sans bloquer le script indéfiniment."""
     try:
-        response = requests.post(
-            API_URL,
-            json={"user_id": 1, "history": [], "n_recommendations": 1},
-            timeout=2
-        )
-        return response.status_code == 200
-    except:
-        return False
+        return future.result(timeout=RESULT_TIMEOUT)
+    except FutureTimeoutError:
+        return {"status": "error", "error": "Délai de réponse dépassé", "recommendations": []}
 
-def call_recommendation_api(user_id: int, history: List[int], n_recommendations: int = 5) -> Dict:
-    """Appelle l'API Azure Functions pour obtenir des recommandations."""
+
+def call_recommendation_api_cached(user_id: int, history: List[int], n_recommendations: int = 5) -> Dict:
+    """call_recommendation_api avec cache LRU côté client (par session Streamlit).
+    
+    Re-cliquer sur le même utilisateur ne refait pas d'aller-retour HTTP.
+    Les réponses en erreur ne sont pas mises en cache.
+    """
+    cache = st.session_state.setdefault('rec_cache', OrderedDict())
+    key = get_client_cache_key(user_id, history, n_recommendations)
+    
+    if key in cache:
+        cache.move_to_end(key)
+        return {**cache[key], 'from_cache': True}
+    
+    # Appel déjà lancé par prefetch_recommendations, sinon appel direct
+    future = st.session_state.setdefault('rec_prefetch', {}).pop(key, None)
+    if future is not None:
+        result = wait_for_recommendation(future)
+    else:
+        result = call_recommendation_api(user_id, history, n_recommendations)
+    remember_recommendation(cache, key, result)
+    return result
+
+def prefetch_recommendations(user_ids: List[int], histories: Mapping, n_recommendations: int):
+    """Lance en arrière-plan les appels des premiers utilisateurs proposés.
+    
+    Le rendu n'attend pas : les réponses arrivées sont versées dans le cache
+    client au rerun suivant, ou reprises par call_recommendation_api_cached.
+    Un préchargement en échec n'est pas relancé dans la session (le clic
+    explicite, lui, rappelle l'API), et rien n'est lancé si l'API est déconnectée.
+    """
+    if not st.session_state.get('api_connected'):
+        return
+    cache = st.session_state.setdefault('rec_cache', OrderedDict())
+    pending = st.session_state.setdefault('rec_prefetch', {})
+    failed = st.session_state.setdefault('rec_prefetch_failed', set())
+    for key in [key for key, future in pending.items() if future.done()]:
+        result = wait_for_recommendation(pending.pop(key))
+        if result.get('status') == 'success':
+            remember_recommendation(cache, key, result)
+        else:
+            failed.add(key)
+            if result.get('error') == "API non connectée":
+                st.session_state.api_connected = False
+    
+    for user_id in user_ids:
+        history = histories[user_id]
+        key = get_client_cache_key(user_id, history, n_recommendations)
+        if key not in cache and key not in pending and key not in failed:
+            pending[key] = submit_recommendation(user_id, history, n_recommendations)
+
+def call_recommendation_api_batch(payloads: List[Dict],
+                                  session: Optional[requests.Session] = None,
+                                  executor: Optional[ThreadPoolExecutor] = None) -> List[Dict]:
+    """Recommandations pour plusieurs utilisateurs en un seul appel HTTP.
+    
+    Si l'API ne propose pas /api/recommend_batch, les appels unitaires sont
+    envoyés en parallèle. Retourne toujours un résultat par payload (éléments
+    en erreur si l'appel échoue ou si la réponse est inexploitable).
+    """
+    def errors(error: str) -> List[Dict]:
+        return [{"status": "error", "error": error, "recommendations": []} for _ in payloads]
+    
+    session = session or get_http_session()
     try:
-        payload = {
-            "user_id": user_id,
-            "history": history,
-            "n_recommendations": n_recommendations
-        }
-        
-        response = requests.post(
-            API_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        
+        response = post_json(session, BATCH_API_URL, {"users": payloads}, timeout=30)
         if response.status_code == 200:
-            return response.json()
-        else:
-            return {
-                "status": "error",
-                "error": f"API returned status {response.status_code}",
-                "recommendations": []
-            }
-            
+            results = orjson.loads(response.content)['results']
+            if not isinstance(results, list) or len(results) != len(payloads):
+                return errors("Réponse batch incomplète")
+            return results
+        if response.status_code != 404:
+            return errors(f"API returned status {response.status_code}")
     except requests.exceptions.ConnectionError:
-        return {
-            "status": "error",
-            "error": "API non connectée",
-            "recommendations": []
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "recommendations": []
-        }
+        return errors("API non connectée")
+    except requests.exceptions.RequestException as e:
+        return errors(f"Erreur réseau : {e}")
+    except (ValueError, KeyError, TypeError):
+        # orjson.JSONDecodeError hérite de ValueError
+        return errors("Réponse batch invalide")
+    
+    # Repli : appels unitaires concurrents sur la même session
+    executor = executor or get_api_executor()
+    return list(executor.map(lambda p: call_recommendation_api(**p, session=session), payloads))
 
 # --- Interface principale ---
 
@@ -169,9 +274,12 @@ def main():
     st.title("🎯 My Content Recommender")
     st.markdown("**Système de recommandation hybride** : Content-Based + Collaborative Filtering")
     
+    # Préchauffage des modèles côté API (une seule fois par processus)
+    start_api_prewarm()
+    
     # Initialisation session state
-    if 'api_connected' not in st.session_state:
-        st.session_state.api_connected = check_api_connection()
+    # Sonde API en arrière-plan : ne bloque pas le premier rendu
+    update_api_status()
     
     # ========== SIDEBAR ==========
     with st.sidebar:
@@ -180,13 +288,16 @@ def main():
         # Status API avec indicateur visuel
         col1, col2 = st.columns([3, 1])
         with col1:
-            if st.session_state.api_connected:
+            if st.session_state.api_connected is None:
+                st.info("⏳ Vérification de l'API...")
+            elif st.session_state.api_connected:
                 st.success("✅ API connectée")
             else:
                 st.error("❌ API déconnectée")
         with col2:
             if st.button("🔄"):
-                st.session_state.api_connected = check_api_connection()
+                st.session_state.pop('rec_prefetch_failed', None)
+                start_api_check()
                 # Compatibilité avec différentes versions de Streamlit
                 if hasattr(st, 'rerun'):
                     st.rerun()
@@ -213,6 +324,7 @@ def main():
             step=1
         )
         
+        
         st.divider()
         
         # Informations sur les stratégies
@@ -255,13 +367,19 @@ def main():
         st.error("Impossible de charger les données")
         return
     
-    histories, user_stats = create_user_histories(df)
+    if not use_sample and is_artifact_fresh(HISTORIES_FILE):
+        histories, user_stats, buckets = load_prebuilt_histories()
+    else:
+        if not use_sample and HISTORIES_FILE.exists():
+            st.caption("ℹ️ user_histories.parquet est antérieur à clicks.parquet : historiques recalculés (relancer build_histories.py)")
+        histories, user_stats, buckets = create_user_histories(df)
     popular_articles = get_article_popularity(df)
+    popular_counts = get_popular_counts(df)
     
     # Statistiques du dataset
     st.info(f"""
     📊 **Dataset {'sample' if use_sample else 'complet'}** : 
-    {len(user_stats):,} utilisateurs • {df['click_article_id'].nunique():,} articles • {len(df):,} clics
+    {len(user_stats):,} utilisateurs • {count_articles(df):,} articles • {len(df):,} clics
     """)
     
     # Colonnes principales
@@ -273,13 +391,14 @@ def main():
         
         selection_mode = st.radio(
             "Mode de sélection",
-            ["Utilisateur existant", "Utilisateur aléatoire", "Nouvel utilisateur"],
+            ["Utilisateur existant", "Utilisateur aléatoire", "Comparer les profils", "Nouvel utilisateur"],
             index=0
         )
         
         if selection_mode == "Utilisateur existant":
-            # Liste des utilisateurs disponibles
-            user_ids = sorted([int(uid) for uid in user_stats.keys()])
+            # Utilisateurs disponibles : clés CSR déjà triées (ni conversion ni tri à chaque rerun)
+            user_ids = histories.user_ids
+            min_id, max_id = int(user_ids[0]), int(user_ids[-1])
             
             # Choix entre menu déroulant ou saisie directe
             input_method = st.radio(
@@ -290,31 +409,33 @@ def main():
             
             if input_method == "Menu déroulant (Top 300)":
                 # Limiter à 300 pour le menu déroulant
-                display_ids = user_ids[:300] if len(user_ids) > 300 else user_ids
+                display_ids = user_ids[:300].tolist()
                 user_id = st.selectbox(
                     "Choisir un utilisateur",
                     display_ids,
-                    format_func=lambda x: f"User {x} ({user_stats[str(x)]['n_clicks']} clics)"
+                    format_func=lambda x: f"User {x} ({user_stats[x].n_clicks} clics)"
                 )
+                # Préchargement en arrière-plan : le clic sur "Générer" trouve la réponse prête
+                prefetch_recommendations(display_ids[:PREFETCH_USERS], histories, n_recommendations)
             else:
                 # Saisie directe pour n'importe quel ID
                 user_id = st.number_input(
                     "Entrer l'ID utilisateur",
-                    min_value=min(user_ids),
-                    max_value=max(user_ids),
-                    value=user_ids[0],
+                    min_value=min_id,
+                    max_value=max_id,
+                    value=min_id,
                     step=1,
-                    help=f"ID disponibles : {min(user_ids)} à {max(user_ids)}"
+                    help=f"ID disponibles : {min_id} à {max_id}"
                 )
                 
                 # Vérifier que l'ID existe
-                if str(user_id) not in user_stats:
+                if user_id not in user_stats:
                     st.error(f"❌ L'utilisateur {user_id} n'existe pas")
-                    st.info(f"IDs valides : {min(user_ids)} à {max(user_ids)}")
+                    st.info(f"IDs valides : {min_id} à {max_id}")
                     return
             
             # Récupérer l'historique
-            history = histories[str(user_id)]
+            history = histories[user_id]
             
             # Afficher les stats
             profile_name, profile_icon = get_user_profile(len(history))
@@ -326,7 +447,7 @@ def main():
             
             # Afficher l'historique
             with st.expander(f"📜 Historique ({len(history)} articles)", expanded=False):
-                st.write(history[:20])
+                st.write(history[:20].tolist())
                 if len(history) > 20:
                     st.caption(f"... et {len(history)-20} autres")
             
@@ -339,26 +460,16 @@ def main():
             # Sélection aléatoire par profil
             profile_choice = st.selectbox(
                 "Choisir un profil",
-                ["Aléatoire total", "Cold Start (≤5)", "Moderate (6-15)", "Active (>15)"]
+                list(buckets)
             )
             
-            # Filtrer selon le profil
-            if profile_choice == "Cold Start (≤5)":
-                candidates = [uid for uid, stats in user_stats.items() 
-                            if stats['n_clicks'] <= COLD_START_THRESHOLD]
-            elif profile_choice == "Moderate (6-15)":
-                candidates = [uid for uid, stats in user_stats.items() 
-                            if COLD_START_THRESHOLD < stats['n_clicks'] <= ACTIVE_THRESHOLD]
-            elif profile_choice == "Active (>15)":
-                candidates = [uid for uid, stats in user_stats.items() 
-                            if stats['n_clicks'] > ACTIVE_THRESHOLD]
-            else:
-                candidates = list(user_stats.keys())
+            # Candidats pré-calculés par profil (pas de parcours des utilisateurs)
+            candidates = buckets[profile_choice]
             
             if st.button("🎲 Sélectionner aléatoirement", use_container_width=True):
-                if candidates:
-                    user_id = int(random.choice(candidates))
-                    history = histories[str(user_id)]
+                if len(candidates):
+                    user_id = int(candidates[random.randrange(len(candidates))])
+                    history = histories[user_id]
                     
                     profile_name, profile_icon = get_user_profile(len(history))
                     strategy_info = get_strategy_info(len(history))
@@ -373,6 +484,17 @@ def main():
                 else:
                     st.warning("Aucun utilisateur dans cette catégorie")
         
+        elif selection_mode == "Comparer les profils":
+            st.info("Un utilisateur tiré au sort par profil, recommandations en un seul appel")
+            
+            if st.button("⚖️ Comparer", type="primary", use_container_width=True):
+                selected = [
+                    int(buckets[label][random.randrange(len(buckets[label]))])
+                    for label in PROFILE_LABELS if len(buckets[label])
+                ]
+                with col_results:
+                    compare_recommendations(selected, histories, n_recommendations)
+        
         else:  # Nouvel utilisateur
             st.info("Créer un nouvel utilisateur")
             
@@ -391,7 +513,7 @@ def main():
                 selected_articles = st.multiselect(
                     "Sélectionner des articles consultés",
                     options=popular_articles[:50],
-                    format_func=lambda x: f"Article {x}",
+                    format_func=get_article_labels(popular_articles).__getitem__,
                     max_selections=20
                 )
                 history = selected_articles
@@ -408,7 +530,7 @@ def main():
             # Bouton de recommandation
             if st.button("🚀 Générer des recommandations", type="primary", use_container_width=True):
                 with col_results:
-                    generate_recommendations(new_user_id, history, n_recommendations)
+                    generate_recommendations(new_user_id, history, n_recommendations, popular_counts)
     
     # ========== COLONNE DROITE: Résultats ==========
     with col_results:
@@ -416,8 +538,38 @@ def main():
             st.subheader("📊 Résultats")
             st.info("👈 Sélectionnez un utilisateur et cliquez sur 'Générer des recommandations'")
 
-def generate_recommendations(user_id: int, history: List[int], n_recommendations: int):
-    """Génère et affiche les recommandations."""
+def compare_recommendations(user_ids: List[int], histories: Mapping, n_recommendations: int):
+    """Affiche côte à côte les recommandations de plusieurs utilisateurs (appel batch)."""
+    st.subheader("⚖️ Comparaison des profils")
+    
+    payloads = [
+        {"user_id": user_id, "history": histories[user_id], "n_recommendations": n_recommendations}
+        for user_id in user_ids
+    ]
+    start_time = time.time()
+    with st.spinner("🔮 Génération des recommandations..."):
+        results = call_recommendation_api_batch(payloads)
+    total_time = (time.time() - start_time) * 1000
+    st.caption(f"📡 {len(payloads)} utilisateurs en {total_time:.1f}ms")
+    
+    for col, payload, result in zip(st.columns(len(payloads)), payloads, results):
+        with col:
+            profile_name, profile_icon = get_user_profile(len(payload["history"]))
+            st.markdown(f"**User {payload['user_id']}** {profile_icon} {profile_name}")
+            if result.get('status') == 'success':
+                for rec in result['recommendations']:
+                    st.write(f"Article {rec['article_id']} • {rec['score']:.3f}")
+            else:
+                st.error(result.get('error', 'Erreur inconnue'))
+
+
+def generate_recommendations(user_id: int, history: List[int], n_recommendations: int,
+                             popular_counts: Optional[Tuple[Tuple[int, int], ...]] = None):
+    """Génère et affiche les recommandations.
+    
+    Si popular_counts est fourni et l'historique est vide, la réponse est
+    construite localement (voir get_local_popular_recommendations).
+    """
     st.subheader("📊 Résultats")
     
     # Déterminer la stratégie attendue
@@ -426,13 +578,24 @@ def generate_recommendations(user_id: int, history: List[int], n_recommendations
     
     # Timer et appel API
     start_time = time.time()
-    with st.spinner("🔮 Génération des recommandations..."):
-        result = call_recommendation_api(user_id, history, n_recommendations)
+    if len(history) == 0 and popular_counts:
+        result = get_local_popular_recommendations(popular_counts, n_recommendations)
+    else:
+        with st.spinner("🔮 Génération des recommandations..."):
+            result = call_recommendation_api_cached(user_id, history, n_recommendations)
+        
+        # Un vrai appel renseigne aussi l'état de connexion (sans sonde supplémentaire)
+        if result.get('status') == 'success':
+            st.session_state.api_connected = True
+        elif result.get('error') == "API non connectée":
+            st.session_state.api_connected = False
     total_time = (time.time() - start_time) * 1000
     
     # Affichage des résultats
     if result.get('status') == 'success':
         st.success(f"✅ **{len(result['recommendations'])} recommandations générées**")
+        if result.get('fallback') == 'local':
+            st.caption("Articles populaires calculés localement (sans appel à l'API)")
         
         # Métriques en 3 colonnes
         col_a, col_b, col_c = st.columns(3)
@@ -501,7 +664,7 @@ def generate_recommendations(user_id: int, history: List[int], n_recommendations
     
     # Détails techniques
     with st.expander("🔧 Détails JSON"):
-        st.json(result)
+        st.json(orjson.dumps(result).decode())
     
     # Sauvegarder le résultat
     st.session_state['last_result'] = result
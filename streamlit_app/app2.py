@@ -6,11 +6,11 @@ Version optimisée basée sur le code GitHub original
 
 import streamlit as st
 import pandas as pd
-import requests
-import json
-from pathlib import Path
+import numpy as np
 import time
-from typing import Dict, List, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Tuple
+from types import MappingProxyType
 import random
 
 # Configuration de la page
@@ -21,46 +21,26 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Configuration des chemins
-DATA_DIR = Path(__file__).parent / "data"
-SAMPLE_FILE = DATA_DIR / "clicks_sample.csv"
-FULL_FILE = DATA_DIR / "clicks.parquet"
-
-# URL de l'API Azure Functions
-import os
-API_URL = os.getenv('AZURE_FUNCTION_URL', 'http://localhost:7071') + "/api/recommend"
+from common import (
+    ACTIVE_THRESHOLD, CLICK_COLUMNS, CLICK_DTYPES, COLD_START_THRESHOLD,
+    DATA_DIR, FULL_FILE, PROFILES, SAMPLE_FILE, Histories, UserStats,
+    call_recommendation_api, count_articles, get_article_labels,
+    get_article_popularity, get_client_cache_key,
+    get_local_popular_recommendations, get_popular_counts,
+    is_artifact_fresh, load_click_data, remember_recommendation,
+    start_api_check, start_api_prewarm, update_api_status,
+)
 
-# Seuils pour les profils utilisateurs
-COLD_START_THRESHOLD = 5
-ACTIVE_THRESHOLD = 15
+SORTED_FILE = DATA_DIR / "clicks_by_user.parquet"  # clics triés par user_id (build_histories.py)
 
 # Limite pour le menu déroulant (dataset complet uniquement)
 MAX_DROPDOWN_USERS = 100
 
-# --- Fonctions de chargement des données ---
 
-@st.cache_data
-def load_click_data(use_sample: bool = True) -> Tuple[pd.DataFrame, str]:
-    """Charge les données de clics."""
-    if use_sample:
-        if SAMPLE_FILE.exists():
-            df = pd.read_csv(SAMPLE_FILE)
-            return df, "sample"
-        else:
-            st.error(f"❌ Fichier non trouvé : {SAMPLE_FILE}")
-            return pd.DataFrame(), "error"
-    else:
-        if FULL_FILE.exists():
-            with st.spinner("Chargement du dataset complet (52 MB)..."):
-                # Pour le dataset complet, charger seulement un échantillon pour le menu
-                df = pd.read_parquet(FULL_FILE)
-            return df, "full"
-        else:
-            st.error(f"❌ Fichier non trouvé : {FULL_FILE}")
-            return pd.DataFrame(), "error"
+# --- Fonctions de chargement des données ---
 
-@st.cache_data
-def create_user_histories(df: pd.DataFrame, limit_for_dropdown: bool = False) -> Tuple[Dict, Dict]:
+@st.cache_resource(hash_funcs={pd.DataFrame: id})
+def create_user_histories(df: pd.DataFrame, limit_for_dropdown: bool = False) -> Tuple[Mapping, Mapping]:
     """
     Crée les dictionnaires d'historiques et statistiques utilisateurs.
     
@@ -68,139 +48,151 @@ def create_user_histories(df: pd.DataFrame, limit_for_dropdown: bool = False) ->
         df: DataFrame des clics
         limit_for_dropdown: Si True, limite aux top users pour le dataset complet
     """
-    histories = {}
-    user_stats = {}
-    
     # Pour le dataset complet, limiter si nécessaire
     if limit_for_dropdown and len(df) > 100000:
         # Prendre seulement les users les plus actifs
         top_users = df['user_id'].value_counts().head(MAX_DROPDOWN_USERS).index
-        df_limited = df[df['user_id'].isin(top_users)]
-        grouped = df_limited.groupby('user_id')
+        clicks = df[df['user_id'].isin(top_users)]
     else:
-        grouped = df.groupby('user_id')
+        clicks = df
+    
+    if clicks.empty:
+        return MappingProxyType({}), MappingProxyType({})
+    
+    # Tri stable par utilisateur : l'ordre des clics est conservé dans chaque historique
+    user_ids = clicks['user_id'].to_numpy()
+    order = np.argsort(user_ids, kind='stable')
+    user_ids = user_ids[order]
+    articles = clicks['click_article_id'].to_numpy()[order]
     
-    for user_id, group in grouped:
-        articles = group['click_article_id'].tolist()
-        histories[str(user_id)] = articles
-        user_stats[str(user_id)] = {
-            'n_clicks': len(articles),
-            'n_unique': len(set(articles))
-        }
+    # Bornes de chaque utilisateur dans les tableaux triés (NumPy, sans groupby)
+    keys, starts, counts = np.unique(user_ids, return_index=True, return_counts=True)
     
-    return histories, user_stats
+    # Articles distincts : tri par (utilisateur, article) puis comptage des changements
+    pair_order = np.lexsort((articles, user_ids))
+    sorted_articles = articles[pair_order]
+    is_new = np.ones(len(sorted_articles), dtype=np.int64)
+    is_new[1:] = sorted_articles[1:] != sorted_articles[:-1]
+    is_new[starts] = 1
+    n_unique = np.add.reduceat(is_new, starts)
+    
+    offsets = np.append(starts, len(articles))
+    histories = Histories(keys, offsets, articles)
+    keys = keys.tolist()
+    user_stats = {
+        user_id: UserStats(n_clicks, n_uniq)
+        for user_id, n_clicks, n_uniq in zip(keys, counts.tolist(), n_unique.tolist())
+    }
+    
+    # Tables partagées entre sessions (cache_resource) : exposées en lecture seule
+    return histories, MappingProxyType(user_stats)
 
-@st.cache_data
-def load_user_history_by_id(user_id: int, use_sample: bool = True) -> Tuple[List[int], Dict]:
-    """Charge l'historique d'un utilisateur spécifique (optimisé pour grands datasets)."""
+@st.cache_data(max_entries=1024, show_spinner=False)
+def load_user_history_by_id(user_id: int, use_sample: bool = True) -> Tuple[np.ndarray, Optional[Tuple[int, int]]]:
+    """Charge l'historique d'un utilisateur spécifique (optimisé pour grands datasets).
+    
+    L'historique est un tableau int32 (sérialisé tel quel par orjson vers l'API).
+    Les stats sont un tuple simple (n_clicks, n_unique) : le résultat est picklé
+    par st.cache_data, l'appelant construit le UserStats.
+    """
     try:
         if use_sample and SAMPLE_FILE.exists():
-            df = pd.read_csv(SAMPLE_FILE)
+            df = pd.read_csv(SAMPLE_FILE, usecols=CLICK_COLUMNS, dtype=CLICK_DTYPES, engine='pyarrow')
             user_data = df[df['user_id'] == user_id]
         elif not use_sample and FULL_FILE.exists():
-            # Utiliser les filtres Parquet pour ne charger que les données nécessaires
-            df = pd.read_parquet(
-                FULL_FILE,
+            # Utiliser les filtres Parquet pour ne charger que les données nécessaires :
+            # seule la colonne article est décodée, et sur le fichier trié par
+            # utilisateur les row groups hors [min, max] de user_id sont sautés
+            source = SORTED_FILE if is_artifact_fresh(SORTED_FILE) else FULL_FILE
+            user_data = pd.read_parquet(
+                source,
+                columns=['click_article_id'],
                 filters=[('user_id', '==', user_id)]
             )
-            user_data = df
         else:
-            return [], {}
+            return np.empty(0, dtype=np.int32), None
         
         if not user_data.empty:
-            articles = user_data['click_article_id'].tolist()
-            stats = {
-                'n_clicks': len(articles),
-                'n_unique': len(set(articles))
-            }
-            return articles, stats
+            articles = user_data['click_article_id'].to_numpy(dtype=np.int32)
+            return articles, (articles.size, np.unique(articles).size)
         else:
-            return [], {}
+            return np.empty(0, dtype=np.int32), None
             
     except Exception as e:
         st.warning(f"Erreur chargement historique: {e}")
-        return [], {}
+        return np.empty(0, dtype=np.int32), None
+
 
-@st.cache_data
-def get_article_popularity(df: pd.DataFrame, top_n: int = 100) -> List[int]:
-    """Récupère les articles les plus populaires."""
-    article_counts = df['click_article_id'].value_counts()
-    return article_counts.head(top_n).index.tolist()
+@st.cache_resource(hash_funcs={pd.DataFrame: id})
+def get_unique_users(df: pd.DataFrame) -> np.ndarray:
+    """Identifiants utilisateurs distincts, triés (calculés une fois par jeu de données)."""
+    return np.unique(df['user_id'].to_numpy())
+
+@st.cache_resource(hash_funcs={MappingProxyType: id})
+def build_user_dropdown(user_stats: Mapping) -> Tuple[Tuple[int, ...], Tuple[str, ...]]:
+    """Utilisateurs triés par activité décroissante et leurs labels pour le menu déroulant."""
+    user_options = tuple(sorted(user_stats, key=lambda uid: user_stats[uid].n_clicks, reverse=True))
+    user_labels = []
+    for uid in user_options:
+        n_clicks = user_stats[uid].n_clicks
+        profile, icon = get_user_profile(n_clicks)
+        user_labels.append(f"{icon} User {uid} ({n_clicks} clics - {profile})")
+    return user_options, tuple(user_labels)
 
 # --- Fonctions utilitaires ---
 
 def get_user_profile(n_articles: int) -> Tuple[str, str]:
     """Détermine le profil utilisateur basé sur le nombre d'articles."""
-    if n_articles < COLD_START_THRESHOLD:
-        return "Cold Start", "🆕"
-    elif n_articles < ACTIVE_THRESHOLD:
-        return "Moderate", "📊"
-    else:
-        return "Active", "🔥"
+    return PROFILES[(n_articles >= COLD_START_THRESHOLD) + (n_articles >= ACTIVE_THRESHOLD)]
 
-def check_api_connection() -> bool:
-    """Vérifie la connexion à l'API."""
-    try:
-        response = requests.post(
-            API_URL,
-            json={"user_id": 1, "history": [], "n_recommendations": 1},
-            timeout=2
-        )
-        return response.status_code == 200
-    except:
-        return False
 
-def call_recommendation_api(user_id: int, history: List[int], n_recommendations: int = 5) -> Dict:
-    """Appelle l'API Azure Functions pour obtenir des recommandations."""
-    try:
-        payload = {
-            "user_id": user_id,
-            "history": history,
-            "n_recommendations": n_recommendations
-        }
-        
-        response = requests.post(
-            API_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return {
-                "status": "error",
-                "error": f"API returned status {response.status_code}",
-                "recommendations": []
-            }
-            
-    except requests.exceptions.ConnectionError:
-        return {
-            "status": "error",
-            "error": "API non connectée",
-            "recommendations": []
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": str(e),
-            "recommendations": []
-        }
+def call_recommendation_api_cached(user_id: int, history: List[int], n_recommendations: int = 5) -> Dict:
+    """call_recommendation_api avec cache LRU côté client (par session Streamlit).
+    
+    Re-cliquer sur le même utilisateur ne refait pas d'aller-retour HTTP.
+    Les réponses en erreur ne sont pas mises en cache.
+    """
+    cache = st.session_state.setdefault('rec_cache', OrderedDict())
+    key = get_client_cache_key(user_id, history, n_recommendations)
+    
+    if key in cache:
+        cache.move_to_end(key)
+        return {**cache[key], 'from_cache': True}
+    
+    result = call_recommendation_api(user_id, history, n_recommendations)
+    remember_recommendation(cache, key, result)
+    return result
+
 
-def generate_recommendations(user_id: int, history: List[int], n_recommendations: int):
-    """Génère et affiche les recommandations."""
+def generate_recommendations(user_id: int, history: List[int], n_recommendations: int,
+                             popular_counts: Optional[Tuple[Tuple[int, int], ...]] = None):
+    """Génère et affiche les recommandations.
+    
+    Si popular_counts est fourni et l'historique est vide, la réponse est
+    construite localement (voir get_local_popular_recommendations).
+    """
     st.subheader("📊 Résultats")
     
     # Timer et appel API
     start_time = time.time()
-    with st.spinner("🔮 Génération des recommandations..."):
-        result = call_recommendation_api(user_id, history, n_recommendations)
+    if len(history) == 0 and popular_counts:
+        result = get_local_popular_recommendations(popular_counts, n_recommendations)
+    else:
+        with st.spinner("🔮 Génération des recommandations..."):
+            result = call_recommendation_api_cached(user_id, history, n_recommendations)
+        
+        # Un vrai appel renseigne aussi l'état de connexion (sans sonde supplémentaire)
+        if result.get('status') == 'success':
+            st.session_state.api_connected = True
+        elif result.get('error') == "API non connectée":
+            st.session_state.api_connected = False
     total_time = (time.time() - start_time) * 1000
     
     # Affichage des résultats
     if result['status'] == 'success':
         st.success(f"✅ **{len(result['recommendations'])} recommandations générées**")
+        if result.get('fallback') == 'local':
+            st.caption("Articles populaires calculés localement (sans appel à l'API)")
         
         # Métriques
         col_a, col_b, col_c = st.columns(3)
@@ -253,9 +245,12 @@ def main():
     st.title("🎯 My Content Recommender")
     st.markdown("**Système de recommandation Content-Based** - Projet 10 OpenClassrooms")
     
+    # Préchauffage des modèles côté API (une seule fois par processus)
+    start_api_prewarm()
+    
     # Initialisation session state
-    if 'api_connected' not in st.session_state:
-        st.session_state.api_connected = check_api_connection()
+    # Sonde API en arrière-plan : ne bloque pas le premier rendu
+    update_api_status()
     
     # ========== SIDEBAR ==========
     with st.sidebar:
@@ -264,13 +259,15 @@ def main():
         # Status API avec indicateur visuel
         col1, col2 = st.columns([3, 1])
         with col1:
-            if st.session_state.api_connected:
+            if st.session_state.api_connected is None:
+                st.info("⏳ Vérification de l'API...")
+            elif st.session_state.api_connected:
                 st.success("✅ API connectée")
             else:
                 st.error("❌ API déconnectée")
         with col2:
             if st.button("🔄"):
-                st.session_state.api_connected = check_api_connection()
+                start_api_check()
                 st.rerun()
         
         st.divider()
@@ -333,14 +330,16 @@ def main():
             histories, user_stats = create_user_histories(df, limit_for_dropdown=True)
     
     popular_articles = get_article_popularity(df)
+    popular_counts = get_popular_counts(df)
+    unique_users = get_unique_users(df)
     
     # Métriques dataset
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        n_users = df['user_id'].nunique()
+        n_users = len(unique_users)
         st.metric("👥 Utilisateurs", f"{n_users:,}")
     with col2:
-        n_articles = df['click_article_id'].nunique()
+        n_articles = count_articles(df)
         st.metric("📰 Articles", f"{n_articles:,}")
     with col3:
         st.metric("🖱️ Interactions", f"{len(df):,}")
@@ -348,7 +347,7 @@ def main():
         st.metric("💾 Mode", "Sample" if use_sample else "Complet")
     
     # Info sur l'ID 0
-    if 0 in df['user_id'].values:
+    if len(unique_users) and unique_users[0] == 0:
         st.info("ℹ️ Note: Le dataset contient l'user_id 0 qui est un utilisateur valide")
     
     st.divider()
@@ -378,31 +377,17 @@ def main():
                 if not use_sample:
                     history, stats = load_user_history_by_id(user_id_input, use_sample)
                     if stats:
-                        user_stats[str(user_id_input)] = stats
-                        histories[str(user_id_input)] = history
-                
-                user_id_str = str(user_id_input)
+                        # Nouvelles tables : celles en cache sont partagées et en lecture seule
+                        user_stats = {**user_stats, user_id_input: UserStats(*stats)}
+                        histories = {**histories, user_id_input: history}
                 
             else:  # Menu déroulant
                 if not histories:
                     st.warning("⚠️ Chargement des utilisateurs...")
                     histories, user_stats = create_user_histories(df, limit_for_dropdown=True)
                 
-                # Trier les utilisateurs par activité
-                sorted_users = sorted(
-                    histories.keys(),
-                    key=lambda x: user_stats[x]['n_clicks'],
-                    reverse=True
-                )
-                
-                # Créer les labels avec profils
-                user_options = []
-                user_labels = []
-                for uid in sorted_users:
-                    n_clicks = user_stats[uid]['n_clicks']
-                    profile, icon = get_user_profile(n_clicks)
-                    user_options.append(uid)
-                    user_labels.append(f"{icon} User {uid} ({n_clicks} clics - {profile})")
+                # Utilisateurs triés par activité, avec labels (calculés une fois par jeu de données)
+                user_options, user_labels = build_user_dropdown(user_stats)
                 
                 if user_options:
                     selected_idx = st.selectbox(
@@ -410,16 +395,15 @@ def main():
                         range(len(user_options)),
                         format_func=lambda x: user_labels[x]
                     )
-                    user_id_str = user_options[selected_idx]
-                    user_id_input = int(user_id_str)
+                    user_id_input = user_options[selected_idx]
                 else:
                     st.error("Aucun utilisateur disponible")
                     return
             
             # Traitement de l'utilisateur sélectionné
-            if user_id_str in histories:
-                history = histories[user_id_str]
-                n_clicks = user_stats[user_id_str]['n_clicks']
+            if user_id_input in histories:
+                history = histories[user_id_input]
+                n_clicks = user_stats[user_id_input].n_clicks
                 profile_name, profile_icon = get_user_profile(n_clicks)
                 
                 # Affichage du profil
@@ -430,7 +414,7 @@ def main():
                 with col_a:
                     st.metric("Clics totaux", n_clicks)
                 with col_b:
-                    st.metric("Articles uniques", user_stats[user_id_str]['n_unique'])
+                    st.metric("Articles uniques", user_stats[user_id_input].n_unique)
                 
                 # Affichage de l'historique avec gestion des longs historiques
                 st.write(f"**Total: {len(history)} articles**")
@@ -447,36 +431,30 @@ def main():
                     history = []
                     if st.button("🚀 Générer des recommandations", type="primary", use_container_width=True):
                         with col_results:
-                            generate_recommendations(user_id_input, history, n_recommendations)
+                            generate_recommendations(user_id_input, history, n_recommendations, popular_counts)
         
         elif user_mode == "Utilisateur aléatoire":
             st.info("🎲 Sélection aléatoire")
             
             if st.button("🎲 Tirer un utilisateur au sort", use_container_width=True):
-                # Pour le sample, utiliser la liste existante
-                if use_sample and histories:
-                    random_uid = random.choice(list(histories.keys()))
-                else:
-                    # Pour le dataset complet, tirer un ID aléatoire
-                    all_users = df['user_id'].unique()
-                    random_uid = str(random.choice(all_users))
+                # Tirage dans le tableau d'identifiants mis en cache (sample comme complet)
+                random_uid = int(unique_users[random.randrange(len(unique_users))])
                 
                 st.session_state['random_user'] = random_uid
             
             if 'random_user' in st.session_state:
-                user_id_str = st.session_state['random_user']
-                user_id_input = int(user_id_str)
+                user_id_input = st.session_state['random_user']
                 
                 # Charger l'historique si nécessaire
-                if user_id_str not in histories:
+                if user_id_input not in histories:
                     history, stats = load_user_history_by_id(user_id_input, use_sample)
                     if stats:
-                        user_stats[user_id_str] = stats
-                        histories[user_id_str] = history
+                        user_stats = {**user_stats, user_id_input: UserStats(*stats)}
+                        histories = {**histories, user_id_input: history}
                 
-                if user_id_str in histories:
-                    history = histories[user_id_str]
-                    n_clicks = user_stats[user_id_str]['n_clicks']
+                if user_id_input in histories:
+                    history = histories[user_id_input]
+                    n_clicks = user_stats[user_id_input].n_clicks
                     profile_name, profile_icon = get_user_profile(n_clicks)
                     
                     st.success(f"✅ User {user_id_input} sélectionné")
@@ -505,7 +483,7 @@ def main():
                 selected_articles = st.multiselect(
                     "Sélectionner des articles consultés",
                     options=popular_articles[:50],
-                    format_func=lambda x: f"Article {x}",
+                    format_func=get_article_labels(popular_articles).__getitem__,
                     max_selections=20
                 )
                 history = selected_articles
@@ -520,7 +498,7 @@ def main():
             # Bouton de recommandation
             if st.button("🚀 Générer des recommandations", type="primary", use_container_width=True):
                 with col_results:
-                    generate_recommendations(new_user_id, history, n_recommendations)
+                    generate_recommendations(new_user_id, history, n_recommendations, popular_counts)
     
     # ========== COLONNE DROITE: Résultats ==========
     with col_results:
@@ -0,0 +1,68 @@
+"""
+Pré-calcul des artefacts de l'interface Streamlit à partir de data/clicks.parquet :
+- data/user_histories.parquet : une ligne par utilisateur, pour éviter
+  l'agrégation des 2,9M clics à chaque démarrage de l'application ;
+- data/clicks.feather : clics (user_id, click_article_id) en Arrow IPC non
+  compressé, mappé en mémoire au chargement (pas de décompression Parquet) ;
+- data/clicks_by_user.parquet : clics triés par utilisateur, en row groups
+  bornés, pour que le filtre user_id saute les row groups via leurs min/max.
+"""
+
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+DATA_DIR = Path(__file__).parent / "data"
+CLICKS_FILE = DATA_DIR / "clicks.parquet"
+HISTORIES_FILE = DATA_DIR / "user_histories.parquet"
+FEATHER_FILE = DATA_DIR / "clicks.feather"
+SORTED_FILE = DATA_DIR / "clicks_by_user.parquet"
+ROW_GROUP_SIZE = 50_000
+
+clicks = pd.read_parquet(CLICKS_FILE, columns=['user_id', 'click_article_id']).astype('int32')
+
+feather.write_feather(clicks, FEATHER_FILE, compression='uncompressed')
+size_mb = FEATHER_FILE.stat().st_size / (1024**2)
+print(f"✅ {FEATHER_FILE.name} écrit : {len(clicks):,} clics ({size_mb:.1f} MB)")
+
+# Tri stable par utilisateur : l'ordre des clics est conservé dans chaque historique
+user_ids = clicks['user_id'].to_numpy()
+order = np.argsort(user_ids, kind='stable')
+user_ids = user_ids[order]
+articles = clicks['click_article_id'].to_numpy()[order].astype(np.int32)
+keys, starts, counts = np.unique(user_ids, return_index=True, return_counts=True)
+
+# Clics triés par utilisateur : statistiques de row group disjointes (predicate pushdown)
+pq.write_table(
+    pa.table({'user_id': pa.array(user_ids), 'click_article_id': pa.array(articles)}),
+    SORTED_FILE,
+    row_group_size=ROW_GROUP_SIZE,
+    use_dictionary=['click_article_id'],
+    compression='zstd',
+    write_statistics=['user_id']
+)
+size_mb = SORTED_FILE.stat().st_size / (1024**2)
+print(f"✅ {SORTED_FILE.name} écrit : {len(user_ids):,} clics triés par utilisateur ({size_mb:.1f} MB)")
+
+# Articles distincts par utilisateur
+sorted_articles = articles[np.lexsort((articles, user_ids))]
+is_new = np.ones(len(sorted_articles), dtype=np.int64)
+is_new[1:] = sorted_articles[1:] != sorted_articles[:-1]
+is_new[starts] = 1
+n_unique = np.add.reduceat(is_new, starts)
+
+# Listes Arrow : offsets + valeurs, sans matérialiser de listes Python
+offsets = np.append(starts, len(articles)).astype(np.int32)
+table = pa.table({
+    'user_id': pa.array(keys.astype(np.int32)),
+    'articles': pa.ListArray.from_arrays(pa.array(offsets), pa.array(articles)),
+    'n_clicks': pa.array(counts.astype(np.int32)),
+    'n_unique': pa.array(n_unique.astype(np.int32)),
+})
+pq.write_table(table, HISTORIES_FILE)
+
+size_mb = HISTORIES_FILE.stat().st_size / (1024**2)
+print(f"✅ {HISTORIES_FILE.name} écrit : {len(keys):,} utilisateurs ({size_mb:.1f} MB)")
@@ -0,0 +1,335 @@
+"""
+My Content Recommender - Éléments partagés des interfaces Streamlit
+Chargement des clics, appels à l'API et repli local (app.py et app2.py)
+"""
+
+import os
+import collections.abc
+import streamlit as st
+import pandas as pd
+import numpy as np
+import pyarrow.feather as feather
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# Configuration des chemins
+DATA_DIR = Path(__file__).parent / "data"
+SAMPLE_FILE = DATA_DIR / "clicks_sample.csv"
+FULL_FILE = DATA_DIR / "clicks.parquet"
+# Copie Arrow IPC non compressée (streamlit_app/build_histories.py), mappée en mémoire
+FEATHER_FILE = DATA_DIR / "clicks.feather"
+
+# Seules colonnes utilisées par l'application (lecture colonnaire)
+CLICK_COLUMNS = ['user_id', 'click_article_id']
+# Identifiants < 2^31 (322k users, 364k articles) : int32 divise la mémoire par deux
+CLICK_DTYPES = {'user_id': 'int32', 'click_article_id': 'int32'}
+
+# URL de l'API Azure Functions
+API_BASE_URL = os.getenv('AZURE_FUNCTION_URL', 'http://localhost:7071')
+API_URL = API_BASE_URL + "/api/recommend"
+HEALTH_URL = API_BASE_URL + "/api/health"
+
+# Délai de la sonde de santé (démarrage à froid de l'API compris, sans nouvelle tentative)
+HEALTH_TIMEOUT = 2
+
+# Nombre de réponses API gardées en cache côté client (par session)
+CLIENT_CACHE_SIZE = 256
+
+# Seuils pour les profils utilisateurs
+COLD_START_THRESHOLD = 5
+ACTIVE_THRESHOLD = 15
+
+# Profils par tranche d'activité (construits une seule fois)
+PROFILES = (("Cold Start", "🆕"), ("Moderate", "📊"), ("Active", "🔥"))
+
+
+class UserStats(NamedTuple):
+    """Statistiques de clics d'un utilisateur (plus compact qu'un dict)."""
+    n_clicks: int
+    n_unique: int
+
+
+class Histories(collections.abc.Mapping):
+    """Historiques de tous les utilisateurs au format CSR.
+    
+    Un seul tableau int32 de clics (triés par utilisateur) et les offsets de
+    chaque utilisateur : un historique est une vue en lecture seule, sans
+    liste Python par utilisateur. Convertir avec .tolist() pour l'API.
+    """
+    
+    def __init__(self, user_ids: np.ndarray, offsets: np.ndarray, values: np.ndarray):
+        self.user_ids = user_ids  # triés, pour la recherche dichotomique
+        self.offsets = offsets
+        self.values = values
+        self.values.flags.writeable = False
+    
+    def _position(self, user_id: int) -> int:
+        pos = int(np.searchsorted(self.user_ids, user_id))
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return pos
+        return -1
+    
+    def __getitem__(self, user_id: int) -> np.ndarray:
+        pos = self._position(user_id)
+        if pos < 0:
+            raise KeyError(user_id)
+        return self.values[self.offsets[pos]:self.offsets[pos + 1]]
+    
+    def __contains__(self, user_id) -> bool:
+        return self._position(user_id) >= 0
+    
+    def __iter__(self):
+        return iter(self.user_ids.tolist())
+    
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+def is_artifact_fresh(path: Path) -> bool:
+    """Artefact de build_histories.py présent et au moins aussi récent que clicks.parquet.
+    
+    Après un rafraîchissement des clics, un artefact plus ancien est ignoré :
+    les données sont alors recalculées depuis clicks.parquet.
+    """
+    return (path.exists() and FULL_FILE.exists()
+            and path.stat().st_mtime >= FULL_FILE.stat().st_mtime)
+
+
+# DataFrame partagé entre sessions sans copie (jamais modifié par l'application)
+@st.cache_resource
+def load_click_data(use_sample: bool = True) -> Tuple[pd.DataFrame, str]:
+    """Charge les données de clics."""
+    if use_sample:
+        if SAMPLE_FILE.exists():
+            df = pd.read_csv(SAMPLE_FILE, usecols=CLICK_COLUMNS, dtype=CLICK_DTYPES, engine='pyarrow')
+            return df, "sample"
+        else:
+            st.error(f"❌ Fichier non trouvé : {SAMPLE_FILE}")
+            return pd.DataFrame(), "error"
+    else:
+        if FULL_FILE.exists():
+            with st.spinner("Chargement du dataset complet (52 MB)..."):
+                if is_artifact_fresh(FEATHER_FILE):
+                    df = feather.read_table(
+                        FEATHER_FILE, columns=CLICK_COLUMNS, memory_map=True
+                    ).to_pandas()
+                else:
+                    df = pd.read_parquet(FULL_FILE, columns=CLICK_COLUMNS).astype(CLICK_DTYPES)
+            return df, "full"
+        else:
+            st.error(f"❌ Fichier non trouvé : {FULL_FILE}")
+            return pd.DataFrame(), "error"
+
+
+@st.cache_resource(hash_funcs={pd.DataFrame: id})
+def get_popular_counts(df: pd.DataFrame, top_n: int = 100) -> Tuple[Tuple[int, int], ...]:
+    """Articles les plus cliqués et leur nombre de clics, par popularité décroissante."""
+    codes, articles = pd.factorize(df['click_article_id'].to_numpy())
+    counts = np.bincount(codes)
+    top_n = min(top_n, len(counts))
+    if top_n == 0:
+        return ()
+    
+    # Sélection partielle O(U), puis tri des top_n seulement
+    top = np.argpartition(counts, -top_n)[-top_n:]
+    top = top[np.argsort(-counts[top], kind='stable')]
+    return tuple(zip(articles[top].tolist(), counts[top].tolist()))
+
+
+@st.cache_resource(hash_funcs={pd.DataFrame: id})
+def get_article_popularity(df: pd.DataFrame, top_n: int = 100) -> Tuple[int, ...]:
+    """Récupère les articles les plus populaires (tuple : options Streamlit hachées à moindre coût)."""
+    return tuple(article_id for article_id, _ in get_popular_counts(df, top_n))
+
+
+@st.cache_resource
+def get_article_labels(articles: Tuple[int, ...]) -> Dict[int, str]:
+    """Libellés des articles pour les listes de sélection (construits une seule fois)."""
+    return {article_id: f"Article {article_id}" for article_id in articles}
+
+
+@st.cache_resource(hash_funcs={pd.DataFrame: id})
+def count_articles(df: pd.DataFrame) -> int:
+    """Nombre d'articles distincts cliqués (calculé une fois par jeu de données)."""
+    return len(pd.unique(df['click_article_id'].to_numpy()))
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Session HTTP partagée entre les reruns (connexions keep-alive réutilisées)."""
+    session = requests.Session()
+    # Une seule nouvelle tentative, sur erreur de connexion (POST non rejoué après envoi)
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(total=1, backoff_factor=0.1)
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_probe_session() -> requests.Session:
+    """Session dédiée à la sonde de santé : aucune nouvelle tentative.
+    
+    Avec la session principale (Retry(total=1)), une API injoignable coûtait
+    deux fois le délai avant d'afficher « déconnectée ».
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_background_executor() -> ThreadPoolExecutor:
+    """Pool de threads partagé pour les appels hors du chemin de rendu."""
+    return ThreadPoolExecutor(max_workers=2)
+
+
+def post_json(session: requests.Session, url: str, payload: Dict, timeout: float) -> requests.Response:
+    """POST JSON encodé avec orjson (accepte directement les tableaux NumPy)."""
+    return session.post(
+        url,
+        data=orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY),
+        headers={"Content-Type": "application/json"},
+        timeout=timeout
+    )
+
+
+@st.cache_resource
+def start_api_prewarm() -> Future:
+    """Lance une fois par processus un appel de préchauffage de l'API.
+    
+    Le premier appel réel charge les modèles depuis le Blob Storage (~110ms
+    et plus à froid) : ce POST en arrière-plan le fait avant le premier clic.
+    """
+    return get_background_executor().submit(
+        post_json, get_http_session(), API_URL,
+        {"user_id": 1, "history": [], "n_recommendations": 1},
+        30
+    )
+
+
+def check_api_connection(session: Optional[requests.Session] = None) -> bool:
+    """Vérifie la connexion à l'API.
+    
+    La session peut être passée explicitement pour un appel depuis un thread
+    d'arrière-plan (hors contexte d'exécution Streamlit).
+    """
+    session = session or get_probe_session()
+    try:
+        # Sonde légère : pas de calcul de recommandation côté serveur
+        response = session.get(HEALTH_URL, timeout=HEALTH_TIMEOUT)
+        if response.status_code == 404:
+            # API déployée sans /api/health : ancienne sonde POST
+            response = post_json(
+                session, API_URL,
+                {"user_id": 1, "history": [], "n_recommendations": 1},
+                timeout=HEALTH_TIMEOUT
+            )
+        return response.status_code == 200
+    except:
+        return False
+
+
+def start_api_check():
+    """Lance la sonde API en arrière-plan : ne bloque pas le rendu.
+    
+    Utilisée au premier rendu et par le bouton 🔄 ; le statut reste « en cours »
+    (api_connected à None) jusqu'à ce que update_api_status lise le résultat.
+    """
+    st.session_state.api_connected = None
+    st.session_state.api_future = get_background_executor().submit(
+        check_api_connection, get_probe_session()
+    )
+
+
+def update_api_status():
+    """Démarre la sonde à la première exécution, puis récupère son résultat s'il est prêt."""
+    if 'api_connected' not in st.session_state:
+        start_api_check()
+    api_future = st.session_state.get('api_future')
+    if api_future is not None and api_future.done():
+        st.session_state.api_connected = api_future.result()
+        del st.session_state['api_future']
+
+
+def call_recommendation_api(user_id: int, history: List[int], n_recommendations: int = 5,
+                            session: Optional[requests.Session] = None) -> Dict:
+    """Appelle l'API Azure Functions pour obtenir des recommandations."""
+    session = session or get_http_session()
+    try:
+        payload = {
+            "user_id": user_id,
+            "history": np.ascontiguousarray(history, dtype=np.int64),
+            "n_recommendations": n_recommendations
+        }
+        
+        response = post_json(session, API_URL, payload, timeout=10)
+        
+        if response.status_code == 200:
+            return orjson.loads(response.content)
+        else:
+            return {
+                "status": "error",
+                "error": f"API returned status {response.status_code}",
+                "recommendations": []
+            }
+            
+    except requests.exceptions.ConnectionError:
+        return {
+            "status": "error",
+            "error": "API non connectée",
+            "recommendations": []
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": str(e),
+            "recommendations": []
+        }
+
+
+def get_client_cache_key(user_id: int, history: List[int], n_recommendations: int) -> Tuple[int, bytes, int]:
+    """Clé du cache client : l'historique est pris par ses octets int64."""
+    return (user_id, np.asarray(history, dtype=np.int64).tobytes(), n_recommendations)
+
+
+def remember_recommendation(cache: OrderedDict, key: Tuple[int, bytes, int], result: Dict):
+    """Ajoute une réponse réussie au cache client (LRU borné à CLIENT_CACHE_SIZE)."""
+    if result.get('status') == 'success':
+        cache[key] = result
+        while len(cache) > CLIENT_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def get_local_popular_recommendations(popular_counts: Tuple[Tuple[int, int], ...], n_recommendations: int) -> Dict:
+    """Réponse cold start sans historique, servie localement (articles populaires).
+    
+    Sans historique, l'API ne peut rien personnaliser et renvoie elle aussi des
+    articles populaires : pas d'aller-retour HTTP dans ce cas. Les scores sont
+    calculés comme côté API (clics / clics de l'article le plus populaire) ;
+    la réponse est marquée "fallback": "local".
+    """
+    max_count = popular_counts[0][1]
+    return {
+        "status": "success",
+        "strategy": "cold_start",
+        "weights": {"cb": 1.0, "cf": 0.0},
+        "recommendations": [
+            {"article_id": article_id, "score": count / max_count, "source": "popular", "rank": rank + 1}
+            for rank, (article_id, count) in enumerate(popular_counts[:n_recommendations])
+        ],
+        "fallback": "local",
+        "from_cache": False,
+        "inference_time_ms": 0.0
+    }